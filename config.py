@@ -8,3 +8,13 @@ OPENWEATHER_KEY = os.environ.get('OPENWEATHER_KEY')
 GITHUB_REPO = os.environ.get('GITHUB_REPO')
 GITHUB_TOKEN = os.environ.get('GITHUB_TOKEN')
 DEFAULT_LANG = os.environ.get('DEFAULT_LANG', 'en')
+ADMIN_USER_IDS = {int(x) for x in os.environ.get('ADMIN_USER_IDS', '').replace(',', ' ').split() if x.isdigit()}
+WEATHER_CACHE_TTL = int(os.environ.get('WEATHER_CACHE_TTL', '600'))
+WEATHER_PREFETCH_TOP_N = int(os.environ.get('WEATHER_PREFETCH_TOP_N', '20'))
+WEATHER_PREFETCH_INTERVAL = int(os.environ.get('WEATHER_PREFETCH_INTERVAL', '120'))
+WEATHER_PREFETCH_BUDGET = int(os.environ.get('WEATHER_PREFETCH_BUDGET', '60'))
+SCHEDULER_DB = os.environ.get('SCHEDULER_DB', 'jarvis_jobs.db')
+SCHEDULER_IO_WORKERS = int(os.environ.get('SCHEDULER_IO_WORKERS', '20'))
+SCHEDULER_CPU_WORKERS = int(os.environ.get('SCHEDULER_CPU_WORKERS', '0')) or os.cpu_count() or 2
+SCHEDULER_MISFIRE_GRACE = int(os.environ.get('SCHEDULER_MISFIRE_GRACE', '300'))
+RATES_DIR = os.environ.get('RATES_DIR', 'rates_store')
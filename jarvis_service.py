@@ -1,5 +1,5 @@
 # jarvis_service.py - Jarvis Cloud Assistant (Autonomous AI Agent)
-import os, sys, time, pkgutil, importlib, logging
+import os, sys, time, pkgutil, importlib, logging, threading
 from telegram.ext import Updater, CommandHandler, MessageHandler, Filters
 from dotenv import load_dotenv
 load_dotenv()
@@ -11,12 +11,20 @@ except Exception:
     pass
 
 from config import TELEGRAM_TOKEN, MONGODB_URI, OPENWEATHER_KEY, DEFAULT_LANG, GITHUB_REPO, GITHUB_TOKEN
+from config import ADMIN_USER_IDS
+from config import WEATHER_CACHE_TTL, WEATHER_PREFETCH_TOP_N, WEATHER_PREFETCH_INTERVAL, WEATHER_PREFETCH_BUDGET
+from config import SCHEDULER_DB, SCHEDULER_IO_WORKERS, SCHEDULER_CPU_WORKERS, SCHEDULER_MISFIRE_GRACE
+from config import RATES_DIR
 
 if not TELEGRAM_TOKEN:
     print("❌ ERROR: TELEGRAM_TOKEN not configured in environment. Exiting.")
     sys.exit(1)
 
-logging.basicConfig(level=logging.INFO)
+from utils.log_pipeline import setup_logging, shutdown_logging, instrument, queue_state
+
+# Records go through a bounded queue to a single writer thread, so a slow
+# stdout never blocks a handler.
+setup_logging(logging.INFO)
 logger = logging.getLogger("jarvis")
 
 # --- Global services dictionary ---
@@ -26,13 +34,26 @@ services = {
     "github_token": GITHUB_TOKEN,
     "github_repo": GITHUB_REPO,
     "default_lang": DEFAULT_LANG,
+    "weather_cache_ttl": WEATHER_CACHE_TTL,
+    "weather_prefetch_top_n": WEATHER_PREFETCH_TOP_N,
+    "weather_prefetch_interval": WEATHER_PREFETCH_INTERVAL,
+    "weather_prefetch_budget": WEATHER_PREFETCH_BUDGET,
+    "scheduler_db": SCHEDULER_DB,
+    "scheduler_io_workers": SCHEDULER_IO_WORKERS,
+    "scheduler_cpu_workers": SCHEDULER_CPU_WORKERS,
+    "scheduler_misfire_grace": SCHEDULER_MISFIRE_GRACE,
+    "rates_dir": RATES_DIR,
 }
 
-from utils.scheduler import scheduler
+from utils.scheduler import scheduler, configure_scheduler, module_scheduler, remove_namespace, job_metrics, job_count, VOLATILE
+
+# Stores and executors are installed now; the scheduler starts only after
+# the modules are imported, so persisted jobs can resolve their functions.
+configure_scheduler(services)
 
 # --- Initialize Telegram Bot ---
 updater = Updater(TELEGRAM_TOKEN, use_context=True)
-dp = updater.dispatcher
+dp = instrument(updater.dispatcher)
 
 # ---------------------------------------------------------------------------
 # Core Commands
@@ -64,7 +85,9 @@ def load_all_modules():
         try:
             mod = importlib.import_module(name)
             if hasattr(mod, "register"):
-                mod.register(dp, services, scheduler)
+                # Closure jobs from a previous register() would otherwise run twice.
+                remove_namespace(name, jobstore=VOLATILE)
+                mod.register(dp, services, module_scheduler(name))
                 loaded_modules.append({"name": name, "module": mod, "desc": getattr(mod, "DESCRIPTION", "")})
                 logger.info(f"✅ Loaded module: {name}")
         except Exception as e:
@@ -72,6 +95,7 @@ def load_all_modules():
 
 # Load modules on startup
 load_all_modules()
+scheduler.start()
 
 # ---------------------------------------------------------------------------
 # Text-based command handler (fallback)
@@ -139,18 +163,71 @@ def reload_modules(update, context):
 dp.add_handler(CommandHandler("autosync", autosync))
 dp.add_handler(CommandHandler("reload", reload_modules))
 
+# ---------------------------------------------------------------------------
+# Live Diagnostics (admin only)
+# ---------------------------------------------------------------------------
+from utils import profiler
+
+def runtime_state():
+    """Thread, Updater queue and scheduler snapshot for /profile."""
+    threads = threading.enumerate()
+    lines = [f"\n🧵 Threads ({len(threads)}):"]
+    lines += [f"- {t.name}{' (daemon)' if t.daemon else ''}" for t in threads]
+    async_queue = getattr(dp, "_Dispatcher__async_queue", None)
+    lines.append(f"\n📬 Updater: running={updater.running}, update_queue={dp.update_queue.qsize()}, "
+                 f"async_queue={async_queue.qsize() if async_queue is not None else 'n/a'}, workers={dp.workers}")
+    queued, capacity, dropped = queue_state()
+    lines.append(f"📝 Log queue: {queued}/{capacity}, dropped={dropped}")
+    lines.append(f"⏰ Scheduler: state={scheduler.state}, jobs={job_count()}")
+    for alias, executor in getattr(scheduler, "_executors", {}).items():
+        pool = getattr(executor, "_pool", None)
+        work_queue = getattr(pool, "_work_queue", None)
+        lines.append(f"- executor {alias}: {type(executor).__name__}, "
+                     f"threads={len(getattr(pool, '_threads', ()))}, queued={work_queue.qsize() if work_queue is not None else 'n/a'}")
+    slowest = sorted(job_metrics().items(), key=lambda kv: kv[1]["avg"], reverse=True)[:5]
+    for name, m in slowest:
+        lines.append(f"- job {name}: runs={m['runs']} errors={m['errors']} missed={m['missed']} skipped={m['skipped']} "
+                     f"run avg={m['avg']:.2f}s max={m['max']:.2f}s | lag avg={m['lag_avg']:.2f}s max={m['lag_max']:.2f}s")
+    return "\n".join(lines)
+
+def profile_cmd(update, context):
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        update.message.reply_text("⛔ /profile is restricted to admins (ADMIN_USER_IDS).")
+        return
+    try:
+        seconds = int(context.args[0]) if context.args else 10
+    except ValueError:
+        update.message.reply_text("Usage: /profile <seconds>")
+        return
+    seconds = max(1, min(seconds, profiler.MAX_SECONDS))
+    chat_id = update.effective_chat.id
+
+    def run():
+        # The main thread sleeps in updater.idle() and the polling thread sits
+        # in the getUpdates long-poll; neither is handler work.
+        idle = {threading.main_thread().name} | {t.name for t in threading.enumerate() if t.name.endswith(":updater")}
+        success, report, error = profiler.profile(seconds, exclude=idle)
+        text = report + "\n" + runtime_state() if success else f"❌ Profile failed: {error}"
+        # Telegram caps messages at 4096 characters.
+        for i in range(0, len(text), 4000):
+            context.bot.send_message(chat_id, text[i:i + 4000])
+
+    update.message.reply_text(f"⏱ Profiling for {seconds}s…")
+    threading.Thread(target=run, name="jarvis-profiler", daemon=True).start()
+
+dp.add_handler(CommandHandler("profile", profile_cmd))
+
 # ---------------------------------------------------------------------------
 # Bot Main Loop
 # ---------------------------------------------------------------------------
 if __name__ == "__main__":
     updater.start_polling()
     logger.info("🚀 Jarvis service started and listening.")
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        updater.stop()
-        scheduler.shutdown()
+    # idle() returns after SIGINT, SIGTERM or SIGABRT (containers stop with
+    # SIGTERM, which skips atexit) once the Updater has stopped.
+    updater.idle()
+    scheduler.shutdown()
+    shutdown_logging()
 
 # ---------------------------------------------------------------------------
 # Optional: Voice Integration Auto-Start
@@ -158,7 +235,7 @@ if __name__ == "__main__":
 if os.environ.get("ENABLE_VOICE", "0") == "1":
     try:
         from modules.voice import register as voice_register
-        voice_register(dp, services, scheduler)
+        voice_register(dp, services, module_scheduler("voice"))
         print("🎙️ Voice listener loaded successfully.")
     except Exception as e:
         print("⚠️ Failed to start voice listener:", e)
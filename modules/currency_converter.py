@@ -2,32 +2,104 @@ DESCRIPTION = "Currency Converter: Convert between different currencies using re
 
 def register(dp, services, scheduler):
     """
-    Register the /convert command:
-    Usage: /convert <amount> <from_currency> <to_currency>
+    Register the /convert and /rates commands:
+    Usage: /convert <amount> <from_currency> <to_currency> [on <YYYY-MM-DD>]
     Example: /convert 100 USD INR
+    Usage: /rates history <from_currency> <to_currency> <days>
+
+    Inline: @<bot> 100 usd inr (or "100 usd to inr"; "100 usd i" lists matching targets)
     """
     from telegram.ext import CommandHandler
+    from telegram import InlineQueryResultArticle, InputTextMessageContent
     import requests
     import logging
+    import threading
+    import time
+    import re
+    from datetime import datetime, timezone
+    from utils import inline
+    from utils.rate_store import get_store
 
     logger = logging.getLogger("jarvis.currency_converter")
 
     API_URL = "https://api.exchangerate-api.com/v4/latest/"
+    RATES_TTL = 600  # the upstream table refreshes daily; 10 minutes is plenty fresh
+    # "<amount> <from>" decides which rate table is needed; the target may still be half-typed.
+    # Only "." is a decimal mark, as in /convert, so "1,000" is not read as 1.
+    INLINE_PREFIX = re.compile(r"^(\d+(?:\.\d+)?) ([a-z]{3})\b")
+    INLINE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s+([a-z]{3})(?:\s+(?:to\s+|in\s+)?([a-z]{0,3}))?\s*$", re.I)
+    INLINE_SUGGESTIONS = 10
+
+    MAX_HISTORY_DAYS = 365
+    USAGE = "Usage: /convert <amount> <from_currency> <to_currency> [on <YYYY-MM-DD>]\nExample: /convert 100 USD INR"
+
+    rates_cache = {}  # base currency -> (fetched_at, data)
+    rates_lock = threading.Lock()
+    store = get_store(services.get('rates_dir'))
+
+    def describe_age(seconds):
+        if seconds < 3600:
+            return f"{int(seconds // 60)}m"
+        if seconds < 86400:
+            return f"{seconds / 3600:.1f}h"
+        return f"{seconds / 86400:.1f}d"
+
+    def day(ts):
+        return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
 
     def fetch_exchange_rates(base_currency):
         """Fetch exchange rates for base_currency. Returns (data, error)."""
+        with rates_lock:
+            hit = rates_cache.get(base_currency)
+        if hit and time.time() - hit[0] < RATES_TTL:
+            return hit[1], None
         try:
             r = requests.get(f"{API_URL}{base_currency}", timeout=10)
             r.raise_for_status()
-            return r.json(), None
+            data = r.json()
         except requests.RequestException as e:
             logger.exception("Exchange rate fetch failed")
             return None, str(e)
+        with rates_lock:
+            rates_cache[base_currency] = (time.time(), data)
+        try:
+            store.append(base_currency, data.get("rates") or {}, data.get("time_last_updated"))
+        except OSError:
+            logger.exception("Failed to append rate snapshot")
+        return data, None
+
+    def convert(amount, from_cur, to_cur):
+        """Returns (converted, rate, note, error); note labels offline snapshots."""
+        data, err = fetch_exchange_rates(from_cur)
+        if err:
+            snapshot = store.latest(from_cur, to_cur)
+            if snapshot is None:
+                return None, None, None, f"Failed to fetch rates for {from_cur}: {err}"
+            rate, updated = snapshot
+            note = f"⚠️ Offline: using stored rates from {day(updated)} ({describe_age(time.time() - updated)} old)"
+            return amount * rate, rate, note, None
+        rates = data.get("rates") or {}
+        if to_cur not in rates:
+            return None, None, None, f"Conversion rate for {to_cur} not available (base {from_cur})."
+        rate = rates[to_cur]
+        return amount * rate, rate, None, None
+
+    def format_result(amount, from_cur, to_cur, converted, rate, note=None):
+        text = f"{amount:g} {from_cur} ≈ {converted:,.2f} {to_cur}\nRate: 1 {from_cur} = {rate:.6f} {to_cur}"
+        return f"{text}\n{note}" if note else text
 
     def convert_cmd(update, context):
         args = context.args or []
+        on_date = None
+        if len(args) == 5 and args[3].lower() == "on":
+            try:
+                on_date = datetime.strptime(args[4], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            except ValueError:
+                update.message.reply_text("Date must look like 2024-12-31.")
+                return
+            args = args[:3]
         if len(args) != 3:
-            update.message.reply_text("Usage: /convert <amount> <from_currency> <to_currency>\nExample: /convert 100 USD INR")
+            update.message.reply_text(USAGE)
             return
 
         # Parse inputs
@@ -38,19 +110,86 @@ def register(dp, services, scheduler):
             update.message.reply_text("Please provide a valid numeric amount, e.g. 100 or 12.5")
             return
 
-        # Fetch rates
-        data, err = fetch_exchange_rates(from_cur)
+        if on_date is not None:
+            snapshot = store.latest(from_cur, to_cur, before=on_date.timestamp() + 86400)
+            if snapshot is None:
+                update.message.reply_text(f"No stored {from_cur}/{to_cur} rates on or before {args[4]}.")
+                return
+            rate, updated = snapshot
+            note = f"📅 Stored rates from {day(updated)}"
+            update.message.reply_text(format_result(amount, from_cur, to_cur, amount * rate, rate, note))
+            return
+
+        converted, rate, note, err = convert(amount, from_cur, to_cur)
         if err:
-            update.message.reply_text(f"Failed to fetch rates for {from_cur}: {err}")
+            update.message.reply_text(err)
             return
+        update.message.reply_text(format_result(amount, from_cur, to_cur, converted, rate, note))
 
-        rates = data.get("rates") or {}
-        if to_cur not in rates:
-            update.message.reply_text(f"Conversion rate for {to_cur} not available (base {from_cur}).")
+    def rates_cmd(update, context):
+        args = context.args or []
+        if len(args) != 4 or args[0].lower() != "history":
+            update.message.reply_text("Usage: /rates history <from_currency> <to_currency> <days>\nExample: /rates history USD INR 30")
             return
+        from_cur, to_cur = args[1].upper(), args[2].upper()
+        try:
+            days = max(1, min(int(args[3]), MAX_HISTORY_DAYS))
+        except ValueError:
+            update.message.reply_text("Days must be a whole number, e.g. 30")
+            return
+        points = store.history(from_cur, to_cur, time.time() - days * 86400)
+        if not points:
+            update.message.reply_text(f"No stored {from_cur}/{to_cur} rates in the last {days} day(s).")
+            return
+        first, last = points[0][1], points[-1][1]
+        lines = [f"📈 1 {from_cur} in {to_cur}, last {days} day(s):"]
+        step = max(1, len(points) // 60)  # keep the reply readable
+        lines += [f"{d}: {r:.6f}" for d, r in points[::step]]
+        if (len(points) - 1) % step:
+            lines.append(f"{points[-1][0]}: {last:.6f}")
+        lines.append(f"Min {min(r for _, r in points):.6f} | Max {max(r for _, r in points):.6f} | Change {(last / first - 1):+.2%}")
+        update.message.reply_text("\n".join(lines))
 
-        rate = rates[to_cur]
-        converted = amount * rate
-        update.message.reply_text(f"{amount:g} {from_cur} ≈ {converted:,.2f} {to_cur}\nRate: 1 {from_cur} = {rate:.6f} {to_cur}")
+    def inline_prefix(key):
+        m = INLINE_PREFIX.match(key)
+        return m.group(2).upper() if m else None
+
+    def inline_fetch(base):
+        # Cached per base by utils.inline, so "100 usd i", "100 usd in" and
+        # "250 usd inr" all reuse one upstream table.
+        data, err = fetch_exchange_rates(base)
+        return None if err else (data.get("rates") or {})
+
+    def inline_convert(query, rates):
+        m = INLINE_PATTERN.match(query)
+        if not m:
+            return []
+        amount = float(m.group(1))
+        from_cur, partial = m.group(2).upper(), (m.group(3) or "").upper()
+        if rates is None:
+            # Upstream unreachable: only a complete pair can use the local snapshot.
+            if len(partial) != 3:
+                return []
+            snapshot = store.latest(from_cur, partial)
+            if snapshot is None:
+                return []
+            rate, updated = snapshot
+            note = f"⚠️ Offline: using stored rates from {day(updated)} ({describe_age(time.time() - updated)} old)"
+            targets = [(partial, rate, note)]
+        else:
+            codes = [partial] if len(partial) == 3 else sorted(c for c in rates if c.startswith(partial) and c != from_cur)
+            targets = [(c, rates[c], None) for c in codes[:INLINE_SUGGESTIONS] if c in rates]
+        results = []
+        for to_cur, rate, note in targets:
+            converted = amount * rate
+            results.append(InlineQueryResultArticle(
+                id=f"convert:{amount:g}:{from_cur}:{to_cur}",
+                title=f"💱 {amount:g} {from_cur} ≈ {converted:,.2f} {to_cur}",
+                description=f"1 {from_cur} = {rate:.6f} {to_cur}" + (" (offline)" if note else ""),
+                input_message_content=InputTextMessageContent(format_result(amount, from_cur, to_cur, converted, rate, note)),
+            ))
+        return results
 
     dp.add_handler(CommandHandler("convert", convert_cmd))
+    dp.add_handler(CommandHandler("rates", rates_cmd))
+    inline.register_provider(dp, "currency_converter", render=inline_convert, prefix=inline_prefix, fetch=inline_fetch)
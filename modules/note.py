@@ -1,32 +1,130 @@
 # module/note.py
+import threading
+
 DESCRIPTION = 'Save quick notes to MongoDB or sqlite'
 
+# One Mongo client per process. Kept across importlib.reload so register()
+# can close the client it replaces on /reload.
+_mongo = globals().get('_mongo') or {'client': None, 'indexed': False, 'lock': threading.Lock()}
+
 def register(dp, services, scheduler):
     from telegram.ext import CommandHandler
-    import sqlite3, os
+    import sqlite3, os, logging, uuid
     from datetime import datetime
+    from utils.circuit_breaker import CircuitBreaker
     DB = 'jarvis_data.db'
+    REPLAY_BATCH = 500
+    PROBE_INTERVAL = 30
+    logger = logging.getLogger('jarvis.note')
+    uri = services.get('mongodb_uri')
+    breaker = CircuitBreaker('mongodb', failure_threshold=3, reset_timeout=PROBE_INTERVAL)
+    with _mongo['lock']:
+        previous, _mongo['client'], _mongo['indexed'] = _mongo['client'], None, False
+    if previous is not None:
+        previous.close()
+
+    def get_collection():
+        # Constructing a MongoClient does no I/O, so the lock is never held
+        # across a server-selection timeout.
+        with _mongo['lock']:
+            if _mongo['client'] is None:
+                from pymongo import MongoClient
+                _mongo['client'] = MongoClient(uri, serverSelectionTimeoutMS=2000)
+            return _mongo['client'].jarvis.notes
+
+    def ensure_index():
+        # Only the sync job calls this, so a down server never stalls /note.
+        if not _mongo['indexed']:
+            # Replay upserts on note_uid; older notes have none, hence partial.
+            get_collection().create_index('note_uid', unique=True, partialFilterExpression={'note_uid': {'$exists': True}})
+            _mongo['indexed'] = True
+
+    def ensure_table(conn):
+        cur = conn.cursor()
+        cur.execute('CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER, note TEXT, created_at TEXT, synced INTEGER DEFAULT 0, note_uid TEXT)')
+        cols = [row[1] for row in cur.execute('PRAGMA table_info(notes)')]
+        if 'synced' not in cols:
+            cur.execute('ALTER TABLE notes ADD COLUMN synced INTEGER DEFAULT 0')
+        if 'note_uid' not in cols:
+            # SQLite ids restart if the file is recreated, so replay keys on a random uid instead.
+            cur.execute('ALTER TABLE notes ADD COLUMN note_uid TEXT')
+            cur.execute('UPDATE notes SET note_uid = lower(hex(randomblob(16))) WHERE note_uid IS NULL')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_notes_synced ON notes (synced, id)')
+        conn.commit()
+
+    def replay_local_notes():
+        """Bulk-upsert unsynced SQLite notes into Mongo, REPLAY_BATCH at a time."""
+        from pymongo import UpdateOne
+        if not os.path.exists(DB):
+            return 0
+        conn = sqlite3.connect(DB)
+        total = 0
+        try:
+            ensure_table(conn)
+            cur = conn.cursor()
+            last_id = 0
+            while breaker.allow_request():
+                rows = cur.execute('SELECT id, chat_id, note, created_at, note_uid FROM notes WHERE synced = 0 AND id > ? ORDER BY id LIMIT ?', (last_id, REPLAY_BATCH)).fetchall()
+                if not rows:
+                    break
+                ops = [UpdateOne(
+                    {'note_uid': uid},
+                    {'$setOnInsert': {'chat_id': chat_id, 'note': text, 'created_at': (created_at or '').replace(' ', 'T'), 'source': 'sqlite', 'note_uid': uid}},
+                    upsert=True,
+                ) for nid, chat_id, text, created_at, uid in rows]
+                try:
+                    get_collection().bulk_write(ops, ordered=False)
+                except Exception as e:
+                    logger.warning(f'Note replay batch failed: {e}')
+                    breaker.record_failure()
+                    break
+                breaker.record_success()
+                ids = [r[0] for r in rows]
+                cur.execute('UPDATE notes SET synced = 1 WHERE id IN ({})'.format(','.join('?' * len(ids))), ids)
+                conn.commit()
+                total += len(ids)
+                last_id = ids[-1]
+        finally:
+            conn.close()
+        if total:
+            logger.info(f'Replayed {total} local note(s) to MongoDB')
+        return total
+
+    def mongo_sync_job():
+        # Probe while open; once closed, drain whatever piled up in SQLite.
+        if not breaker.try_probe(lambda: get_collection().database.client.admin.command('ping')):
+            return
+        try:
+            ensure_index()
+        except Exception as e:
+            logger.warning(f'Note index creation failed: {e}')
+            breaker.record_failure()
+            return
+        replay_local_notes()
+
     def note(update, context):
         text = ' '.join(context.args)
         if not text:
             update.message.reply_text('Usage: /note <text>')
             return
-        uri = services.get('mongodb_uri')
-        if uri:
+        if uri and breaker.allow_request():
             try:
-                from pymongo import MongoClient
-                client = MongoClient(uri, serverSelectionTimeoutMS=2000)
-                db = client.jarvis
-                db.notes.insert_one({'chat_id': update.message.chat_id, 'note': text, 'created_at': datetime.utcnow().isoformat()})
+                get_collection().insert_one({'chat_id': update.message.chat_id, 'note': text, 'created_at': datetime.utcnow().isoformat(), 'note_uid': uuid.uuid4().hex})
+                breaker.record_success()
                 update.message.reply_text('Note saved to cloud memory.')
                 return
-            except Exception:
-                pass
+            except Exception as e:
+                logger.warning(f'Mongo note insert failed, falling back to sqlite: {e}')
+                breaker.record_failure()
         conn = sqlite3.connect(DB)
+        ensure_table(conn)
         cur = conn.cursor()
-        cur.execute('CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER, note TEXT, created_at TEXT)')
-        cur.execute('INSERT INTO notes (chat_id,note,created_at) VALUES (?,?,datetime("now"))', (update.message.chat_id, text))
+        cur.execute('INSERT INTO notes (chat_id,note,created_at,synced,note_uid) VALUES (?,?,datetime("now"),0,?)', (update.message.chat_id, text, uuid.uuid4().hex))
         conn.commit()
         conn.close()
         update.message.reply_text('Note saved locally.')
     dp.add_handler(CommandHandler('note', note))
+
+    if uri:
+        scheduler.add_job(mongo_sync_job, 'interval', seconds=PROBE_INTERVAL, id='note_mongo_sync',
+                          replace_existing=True, max_instances=1, coalesce=True)
@@ -1,10 +1,24 @@
 DESCRIPTION = 'Set simple minute-based reminders'
 
+DB = 'jarvis_data.db'
+
+
+def send_reminder(chat_id, message, reminder_id):
+    # Module-level so the job is stored durably and fires after a restart.
+    import sqlite3
+    from telegram import Bot
+    from config import TELEGRAM_TOKEN
+    Bot(TELEGRAM_TOKEN).send_message(chat_id, f'⏰ Reminder: {message}')
+    conn = sqlite3.connect(DB)
+    conn.execute('UPDATE reminders SET sent = 1 WHERE id = ?', (reminder_id,))
+    conn.commit()
+    conn.close()
+
+
 def register(dp, services, scheduler):
     from telegram.ext import CommandHandler
-    from datetime import datetime, timedelta
+    from datetime import datetime, timedelta, timezone
     import sqlite3
-    DB = 'jarvis_data.db'
     def remind(update, context):
         raw = ' '.join(context.args)
         if '|' in raw:
@@ -20,12 +34,16 @@ def register(dp, services, scheduler):
         except:
             update.message.reply_text('First token must be minutes integer.')
             return
-        remind_at = datetime.utcnow() + timedelta(minutes=minutes)
+        remind_at = datetime.now(timezone.utc) + timedelta(minutes=minutes)
         conn = sqlite3.connect(DB)
         cur = conn.cursor()
         cur.execute('CREATE TABLE IF NOT EXISTS reminders (id INTEGER PRIMARY KEY AUTOINCREMENT, chat_id INTEGER, message TEXT, remind_at TEXT, sent INTEGER DEFAULT 0)')
-        cur.execute('INSERT INTO reminders (chat_id,message,remind_at) VALUES (?,?,?)', (update.message.chat_id, msg.strip(), remind_at.isoformat()))
+        cur.execute('INSERT INTO reminders (chat_id,message,remind_at) VALUES (?,?,?)', (update.message.chat_id, msg.strip(), remind_at.replace(tzinfo=None).isoformat()))
+        rid = cur.lastrowid
         conn.commit()
         conn.close()
+        # No misfire grace: a reminder due while the bot was down is sent on startup.
+        scheduler.add_job(send_reminder, 'date', run_date=remind_at, args=(update.message.chat_id, msg.strip(), rid),
+                          id=f'reminder-{rid}', durable=True, misfire_grace_time=None, replace_existing=True)
         update.message.reply_text(f'Reminder set for {minutes} minutes from now.')
     dp.add_handler(CommandHandler('remind', remind))
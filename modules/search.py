@@ -2,12 +2,30 @@ DESCRIPTION = 'Provide Google search link for a query'
 
 def register(dp, services, scheduler):
     from telegram.ext import CommandHandler
-    import requests
+    from telegram import InlineQueryResultArticle, InputTextMessageContent
+    import requests, hashlib
+    from utils import inline
+
+    def search_url(q):
+        return 'https://www.google.com/search?q={}'.format(requests.utils.requote_uri(q))
+
     def search(update, context):
         q = ' '.join(context.args)
         if not q:
             update.message.reply_text('Usage: /search <query)')
             return
-        url = 'https://www.google.com/search?q={}'.format(requests.utils.requote_uri(q))
-        update.message.reply_text('🔎 {}'.format(url))
+        update.message.reply_text('🔎 {}'.format(search_url(q)))
+
+    def inline_search(query, data):
+        q = query.strip()
+        url = search_url(q)
+        return [InlineQueryResultArticle(
+            id=hashlib.md5(('search:' + q).encode()).hexdigest(),
+            title='🔎 Search: {}'.format(q),
+            description=url,
+            url=url,
+            input_message_content=InputTextMessageContent('🔎 {}'.format(url)),
+        )]
+
     dp.add_handler(CommandHandler('search', search))
+    inline.register_provider(dp, 'search', render=inline_search)
@@ -2,7 +2,79 @@ DESCRIPTION = 'Get weather using OpenWeatherMap API (supports English, Hindi, Gu
 
 def register(dp, services, scheduler):
     from telegram.ext import CommandHandler
-    import requests
+    import requests, threading, time, logging
+    from collections import deque
+    from utils.heavy_hitters import SpaceSaving
+    API = 'http://api.openweathermap.org/data/2.5/'
+    GROUP_LIMIT = 20  # OpenWeather accepts at most 20 city ids per /group call
+    CACHE_MAX = 1000
+    ttl = int(services.get('weather_cache_ttl') or 600)
+    top_n = int(services.get('weather_prefetch_top_n') or 20)
+    interval = int(services.get('weather_prefetch_interval') or 120)
+    budget = int(services.get('weather_prefetch_budget') or 60)
+    logger = logging.getLogger('jarvis.weather')
+
+    lock = threading.Lock()
+    cache = {}  # normalized city -> {'at', 'desc', 'temp', 'id', 'prefetched'}
+    popularity = SpaceSaving(capacity=max(100, top_n * 5))
+    prefetch_calls = deque()  # timestamps of /group calls within the last hour
+    last_decay = [time.time()]
+    stats = {'lookups': 0, 'hits': 0, 'prefetch_hits': 0, 'prefetch_calls': 0, 'prefetched': 0}
+
+    def normalize(city):
+        return ' '.join(city.lower().split())
+
+    def store(name, j, prefetched):
+        # Caller holds lock.
+        if name not in cache and len(cache) >= CACHE_MAX:
+            now = time.time()
+            for stale in [k for k, v in cache.items() if now - v['at'] >= ttl]:
+                del cache[stale]
+        cache[name] = {'at': time.time(), 'desc': j['weather'][0]['description'], 'temp': j['main']['temp'],
+                       'id': j.get('id'), 'prefetched': prefetched}
+
+    def prefetch_job():
+        key = services.get('openweather')
+        if not key:
+            return
+        now = time.time()
+        with lock:
+            while prefetch_calls and now - prefetch_calls[0] > 3600:
+                prefetch_calls.popleft()
+            calls_left = budget - len(prefetch_calls)
+            # Halve counts once per TTL so cities popular long ago stop using the budget.
+            if now - last_decay[0] >= ttl:
+                popularity.decay(0.5)
+                last_decay[0] = now
+            # Refresh popular cities that would expire before the next run.
+            due = []
+            for name, count, error in popularity.top(top_n):
+                entry = cache.get(name)
+                if entry and entry['id'] and now - entry['at'] + interval >= ttl:
+                    due.append((entry['id'], name))
+        for i in range(0, len(due), GROUP_LIMIT):
+            if calls_left <= 0:
+                logger.info('Weather prefetch budget exhausted; {} city(ies) left stale'.format(len(due) - i))
+                break
+            calls_left -= 1
+            chunk = due[i:i + GROUP_LIMIT]
+            with lock:
+                prefetch_calls.append(time.time())
+                stats['prefetch_calls'] += 1
+            ids = ','.join(str(cid) for cid, _ in chunk)
+            try:
+                r = requests.get('{}group?id={}&appid={}&units=metric'.format(API, ids, key), timeout=10)
+                r.raise_for_status()
+                by_id = {item['id']: item for item in r.json().get('list', [])}
+            except Exception as e:
+                logger.warning('Weather group prefetch failed: {}'.format(e))
+                continue
+            with lock:
+                for cid, name in chunk:
+                    if cid in by_id:
+                        store(name, by_id[cid], True)
+                        stats['prefetched'] += 1
+
     def weather(update, context):
         city = ' '.join(context.args)
         if not city:
@@ -12,13 +84,46 @@ def register(dp, services, scheduler):
         if not key:
             update.message.reply_text('Weather API not configured.')
             return
-        q = requests.utils.requote_uri(city)
-        r = requests.get('http://api.openweathermap.org/data/2.5/weather?q={}&appid={}&units=metric'.format(q, key))
-        if r.status_code != 200:
-            update.message.reply_text('City not found or API error.')
-            return
-        j = r.json()
-        desc = j['weather'][0]['description']
-        temp = j['main']['temp']
-        update.message.reply_text('Weather in {}: {}, {}°C'.format(city, desc, temp))
+        name = normalize(city)
+        with lock:
+            popularity.offer(name)
+            stats['lookups'] += 1
+            entry = cache.get(name)
+            if entry and time.time() - entry['at'] < ttl:
+                stats['hits'] += 1
+                if entry['prefetched']:
+                    stats['prefetch_hits'] += 1
+            else:
+                entry = None
+        if entry is None:
+            q = requests.utils.requote_uri(city)
+            try:
+                r = requests.get('{}weather?q={}&appid={}&units=metric'.format(API, q, key), timeout=10)
+            except requests.RequestException as e:
+                logger.warning('Weather fetch failed: {}'.format(e))
+                r = None
+            if r is None or r.status_code != 200:
+                update.message.reply_text('City not found or API error.')
+                return
+            j = r.json()
+            with lock:
+                store(name, j, False)
+                entry = cache[name]
+        update.message.reply_text('Weather in {}: {}, {}°C'.format(city, entry['desc'], entry['temp']))
+
+    def weather_stats(update, context):
+        with lock:
+            s = dict(stats)
+            top = popularity.top(5)
+            used = len(prefetch_calls)
+        lookups = s['lookups'] or 1
+        lines = ['🌦 Weather cache stats:',
+                 'Lookups: {} | hit rate: {:.1%} | prefetch hit rate: {:.1%}'.format(s['lookups'], s['hits'] / lookups, s['prefetch_hits'] / lookups),
+                 'Prefetch calls: {} total, {}/{} in the last hour | cities refreshed: {}'.format(s['prefetch_calls'], used, budget, s['prefetched']),
+                 'Top cities: ' + (', '.join('{} ({:g})'.format(n, c) for n, c, _ in top) or 'none')]
+        update.message.reply_text('\n'.join(lines))
+
     dp.add_handler(CommandHandler('weather', weather))
+    dp.add_handler(CommandHandler('weatherstats', weather_stats))
+    scheduler.add_job(prefetch_job, 'interval', seconds=interval, id='weather_prefetch',
+                      replace_existing=True, max_instances=1, coalesce=True)
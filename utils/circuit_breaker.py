@@ -0,0 +1,77 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger('jarvis.circuit_breaker')
+
+
+class CircuitBreaker:
+    """
+    Small thread-safe circuit breaker for flaky backends.
+
+    closed    -> calls go through; consecutive failures are counted.
+    open      -> calls fail fast until a background probe succeeds.
+    half_open -> a single probe is in flight; callers still fail fast.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=3, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def allow_request(self):
+        """Return True if callers may use the backend right now."""
+        return self._state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def try_probe(self, probe):
+        """
+        Run ``probe()`` if the circuit is open and the reset timeout elapsed.
+
+        Returns:
+            bool: True if the circuit is closed after the call.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN:
+                return False
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._state = self.HALF_OPEN
+
+        try:
+            probe()
+        except Exception as e:
+            logger.info(f"Circuit '{self.name}' probe failed: {e}")
+            self.record_failure()
+            return False
+        self.record_success()
+        return True
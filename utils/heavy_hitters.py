@@ -0,0 +1,51 @@
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitters sketch (Metwally et al.).
+
+    Tracks at most ``capacity`` keys. When a new key arrives and the sketch
+    is full, the key with the smallest count is evicted and the newcomer
+    inherits that count as its error bound. Not thread-safe; callers lock.
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._counts = {}
+        self._errors = {}
+
+    def __len__(self):
+        return len(self._counts)
+
+    def offer(self, key, weight=1):
+        if key in self._counts:
+            self._counts[key] += weight
+            return
+        if len(self._counts) < self.capacity:
+            self._counts[key] = weight
+            self._errors[key] = 0
+            return
+        victim = min(self._counts, key=self._counts.get)
+        floor = self._counts.pop(victim)
+        self._errors.pop(victim, None)
+        self._counts[key] = floor + weight
+        self._errors[key] = floor
+
+    def decay(self, factor=0.5):
+        """Scale every count by ``factor`` so old popularity fades; drops keys below 1."""
+        for key in list(self._counts):
+            count = self._counts[key] * factor
+            if count < 1:
+                del self._counts[key]
+                del self._errors[key]
+            else:
+                self._counts[key] = count
+                self._errors[key] *= factor
+
+    def top(self, n):
+        """
+        Return up to ``n`` most frequent keys.
+
+        Returns:
+            list: (key, count, error) tuples, highest count first
+        """
+        ranked = sorted(self._counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(k, c, self._errors[k]) for k, c in ranked]
@@ -0,0 +1,180 @@
+import time
+import threading
+import logging
+from collections import deque
+
+logger = logging.getLogger('jarvis.inline')
+
+CACHE_TTL = 30        # seconds fetched prefix data is reused
+CACHE_MAX = 2000
+DEBOUNCE = 0.3        # wait this long for the user to stop typing before fetching
+MAX_RESULTS = 50      # Telegram's limit per answerInlineQuery
+
+_lock = threading.Lock()
+_providers = {}       # name -> (prefix, fetch, render)
+_cache = {}           # (provider name, prefix) -> (stored_at, data)
+_latest = {}          # user id -> id of that user's newest inline query
+_latencies = deque(maxlen=500)
+_counters = {'queries': 0, 'cache_hits': 0, 'fetches': 0, 'superseded': 0, 'errors': 0}
+_installed = set()
+
+
+def normalize(query):
+    return ' '.join((query or '').lower().split())
+
+
+def register_provider(dp, name, render, prefix=None, fetch=None):
+    """
+    Add (or replace, on reload) an inline result provider.
+
+    ``prefix(normalized_query)`` returns the part of the query the upstream
+    data depends on, or None if the provider does not apply. ``fetch(prefix)``
+    does the upstream call; its result is cached per prefix for CACHE_TTL, so
+    every further keystroke that keeps the same prefix is answered from cache.
+    ``render(query, data)`` turns the data into InlineQueryResult objects and
+    must be cheap. Providers without ``fetch`` need no upstream data.
+    """
+    with _lock:
+        _providers[name] = (prefix or normalize, fetch, render)
+        for key in [k for k in _cache if k[0] == name]:
+            del _cache[key]
+    install(dp)
+
+
+def install(dp):
+    """Attach the shared inline handler and /inlinestats once per dispatcher."""
+    from telegram.ext import InlineQueryHandler, CommandHandler
+    if id(dp) in _installed:
+        return
+    _installed.add(id(dp))
+    # Not run_async: the handler only reads the cache and schedules a
+    # job-queue callback, so it never blocks the shared worker pool.
+    dp.add_handler(InlineQueryHandler(_answer))
+    dp.add_handler(CommandHandler('inlinestats', _stats))
+
+
+def _plan(key):
+    """Split providers into (name, prefix, data) ready to render and (name, prefix) still to fetch."""
+    now = time.time()
+    ready, missing = [], []
+    with _lock:
+        providers = list(_providers.items())
+        for name, (prefix_of, fetch, _render_fn) in providers:
+            p = prefix_of(key)
+            if p is None:
+                continue
+            if fetch is None:
+                ready.append((name, p, None))
+                continue
+            hit = _cache.get((name, p))
+            if hit and now - hit[0] < CACHE_TTL:
+                _counters['cache_hits'] += 1
+                ready.append((name, p, hit[1]))
+            else:
+                missing.append((name, p))
+    return ready, missing
+
+
+def _store(name, prefix, data):
+    with _lock:
+        if len(_cache) >= CACHE_MAX:
+            now = time.time()
+            for stale in [k for k, v in _cache.items() if now - v[0] >= CACHE_TTL]:
+                del _cache[stale]
+            if len(_cache) >= CACHE_MAX:
+                _cache.clear()
+        _cache[(name, prefix)] = (time.time(), data)
+
+
+def _render(iq, ready):
+    order = list(_providers)
+    results = []
+    for name, _prefix, data in sorted(ready, key=lambda r: order.index(r[0]) if r[0] in order else len(order)):
+        render = _providers.get(name, (None, None, None))[2]
+        if render is None:
+            continue
+        try:
+            results.extend(render(iq.query, data) or [])
+        except Exception:
+            with _lock:
+                _counters['errors'] += 1
+            logger.exception(f"Inline provider {name} failed")
+    return results[:MAX_RESULTS]
+
+
+def _still_wanted(iq):
+    return _latest.get(iq.from_user.id) == iq.id
+
+
+def _finish(iq, ready, started):
+    try:
+        iq.answer(_render(iq, ready), cache_time=CACHE_TTL)
+    finally:
+        with _lock:
+            _latencies.append(time.monotonic() - started)
+            if _latest.get(iq.from_user.id) == iq.id:
+                del _latest[iq.from_user.id]
+
+
+def _answer(update, context):
+    iq = update.inline_query
+    started = time.monotonic()
+    key = normalize(iq.query)
+    with _lock:
+        _counters['queries'] += 1
+        if key:
+            _latest[iq.from_user.id] = iq.id
+        else:
+            # An empty query still supersedes any fetch pending for this user.
+            _latest.pop(iq.from_user.id, None)
+    if not key:
+        iq.answer([], cache_time=CACHE_TTL)
+        return
+    ready, missing = _plan(key)
+    if not missing:
+        _finish(iq, ready, started)
+        return
+    # Upstream data is needed: wait for the user to stop typing on the job
+    # queue's timer instead of sleeping on a dispatcher worker.
+    context.job_queue.run_once(_fetch_and_answer, DEBOUNCE, context=(iq, ready, missing, started))
+
+
+def _fetch_and_answer(context):
+    iq, ready, missing, started = context.job.context
+    for name, prefix in missing:
+        if not _still_wanted(iq):
+            with _lock:
+                _counters['superseded'] += 1
+            return
+        fetch = _providers.get(name, (None, None, None))[1]
+        if fetch is None:
+            continue
+        try:
+            data = fetch(prefix)
+        except Exception:
+            with _lock:
+                _counters['errors'] += 1
+            logger.exception(f"Inline provider {name} fetch failed")
+            continue
+        with _lock:
+            _counters['fetches'] += 1
+        _store(name, prefix, data)
+        ready.append((name, prefix, data))
+    if not _still_wanted(iq):
+        with _lock:
+            _counters['superseded'] += 1
+        return
+    _finish(iq, ready, started)
+
+
+def _stats(update, context):
+    with _lock:
+        samples = sorted(_latencies)
+        c = dict(_counters)
+    text = (f"⚡ Inline queries: {c['queries']} | prefix cache hits: {c['cache_hits']} | "
+            f"upstream fetches: {c['fetches']} | superseded: {c['superseded']} | provider errors: {c['errors']}")
+    if samples:
+        p50 = samples[len(samples) // 2] * 1000
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000
+        text += f"\nAnswer latency (last {len(samples)}): p50 {p50:.0f} ms, p95 {p95:.0f} ms, max {samples[-1] * 1000:.0f} ms"
+    update.message.reply_text(text)
@@ -0,0 +1,249 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import functools
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+QUEUE_SIZE = 10000
+SAMPLE_WINDOW = 60    # seconds
+SAMPLE_BURST = 5      # identical warnings/errors let through per window
+FIELDS = ('chat_id', 'command', 'latency_ms', 'suppressed')
+
+_listener = None
+_handler = None
+# chat_id/command of the update the current thread is handling.
+_update_fields = contextvars.ContextVar('jarvis_update_fields', default=None)
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line; extra fields from FIELDS are copied through."""
+
+    def format(self, record):
+        out = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                out[field] = value
+        if record.exc_info:
+            out['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out['exc'] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Stamp chat_id and command of the update being handled onto every record."""
+
+    def filter(self, record):
+        fields = _update_fields.get()
+        if fields:
+            for field, value in fields.items():
+                if getattr(record, field, None) is None:
+                    setattr(record, field, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Let the first SAMPLE_BURST copies of a warning/error through per window,
+    keyed on logger, command, message template and exception type. The next record
+    that passes carries ``suppressed`` with the number dropped meanwhile.
+    """
+
+    def __init__(self, window=SAMPLE_WINDOW, burst=SAMPLE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._seen = {}   # key -> [window_start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING:
+            return True
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.name, getattr(record, 'command', None), str(record.msg), exc_type)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                if len(self._seen) > 1000:
+                    self._seen.clear()
+                self._seen[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            entry[1] += 1
+            if entry[1] <= self.burst:
+                return True
+            entry[2] += 1
+            return False
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """Enqueue without formatting; tracebacks are rendered by the writer thread."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Resolve %-args now so mutable arguments are captured as they were,
+        # but leave exc_info for the listener to format off the hot path.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _NonBlockingQueueHandler.dropped += 1
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Block rather than fail if the queue is full at shutdown.
+        self.queue.put(self._sentinel)
+
+
+def setup_logging(level=logging.INFO, stream=None):
+    """
+    Route the root logger through a bounded queue drained by one writer
+    thread. Safe to call more than once.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return _listener
+    log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    sink = logging.StreamHandler(stream or sys.stdout)
+    sink.setFormatter(StructuredFormatter())
+    _handler = _NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(ContextFilter())   # before sampling, which keys on command
+    _handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    _listener = _Listener(log_queue, sink, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """Drain the queue, stop the writer thread and log synchronously from then on."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_handler)
+    for h in listener.handlers:
+        h.flush()
+        root.addHandler(h)
+
+
+def worker_logging(level=logging.INFO, stream=None):
+    """
+    Process-pool initializer: a forked worker inherits the root QueueHandler,
+    but nothing drains that queue in the child, so log straight to the stream.
+    """
+    global _listener, _handler
+    _listener = _handler = None
+    sink = logging.StreamHandler(stream or sys.stdout)
+    sink.setFormatter(StructuredFormatter())
+    sink.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(sink)
+    root.setLevel(level)
+
+
+def queue_state():
+    """(queued, capacity, dropped) for diagnostics."""
+    if _handler is None:
+        return 0, 0, 0
+    return _handler.queue.qsize(), QUEUE_SIZE, _NonBlockingQueueHandler.dropped
+
+
+def _fields(update, command=None):
+    chat = getattr(update, 'effective_chat', None)
+    return {'chat_id': chat.id if chat else None, 'command': command}
+
+
+def _timed(callback, command):
+    from telegram.ext import DispatcherHandlerStop
+    logger = logging.getLogger('jarvis.handlers')
+
+    @functools.wraps(callback)
+    def wrapper(update, context, *args, **kwargs):
+        started = time.perf_counter()
+        fields = _fields(update, command)
+        token = _update_fields.set(fields)
+
+        def elapsed():
+            return dict(fields, latency_ms=round((time.perf_counter() - started) * 1000, 1))
+
+        try:
+            result = callback(update, context, *args, **kwargs)
+        except DispatcherHandlerStop:
+            logger.info('handled', extra=elapsed())
+            raise
+        except Exception:
+            # Logged once here with the update's context; not re-raised, so
+            # the dispatcher does not print the same traceback again.
+            logger.exception('handler failed', extra=elapsed())
+            return None
+        finally:
+            _update_fields.reset(token)
+        logger.info('handled', extra=elapsed())
+        return result
+
+    return wrapper
+
+
+def _log_dispatch_error(update, context):
+    """Errors that reach the dispatcher outside a wrapped handler, e.g. polling failures."""
+    logging.getLogger('jarvis.handlers').error('dispatch error', exc_info=context.error,
+                                               extra=_fields(update))
+
+
+class InstrumentedDispatcher:
+    """
+    The dispatcher as seen by jarvis_service and the modules: add_handler
+    wraps every callback so it logs chat_id, command and latency; anything
+    else goes to the real dispatcher, which is left unmodified.
+    """
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        dispatcher.add_error_handler(_log_dispatch_error)
+
+    def add_handler(self, handler, *args, **kwargs):
+        commands = getattr(handler, 'command', None)
+        command = commands[0] if commands else type(handler).__name__
+        if hasattr(handler, 'callback') and not getattr(handler.callback, '_jarvis_timed', False):
+            handler.callback = _timed(handler.callback, command)
+            handler.callback._jarvis_timed = True
+        return self.dispatcher.add_handler(handler, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.dispatcher, name)
+
+
+def instrument(dispatcher):
+    """Wrap ``dispatcher`` so every handler added through it is timed and logged."""
+    return InstrumentedDispatcher(dispatcher)
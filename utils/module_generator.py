@@ -35,7 +35,7 @@ Requirements:
 3. Use telegram.ext imports (CommandHandler, MessageHandler, Filters, etc.)
 4. The register function should add handlers to the dispatcher (dp)
 5. Available services: mongodb_uri, openweather, github_token, github_repo, default_lang
-6. scheduler is an APScheduler BackgroundScheduler instance
+6. scheduler is an APScheduler BackgroundScheduler scoped to the module (job ids are namespaced; use a fixed id with replace_existing=True for recurring jobs)
 7. Handle errors gracefully with try/except blocks
 8. Reply to user with helpful messages
 9. Follow the existing module patterns (note.py, reminder.py, search.py, weather.py, voice.py)
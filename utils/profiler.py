@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter
+
+MAX_SECONDS = 120
+SAMPLE_INTERVAL = 0.01   # 100 Hz; one stack walk per live thread per tick
+MAX_DEPTH = 64
+# Leaf frames that mean the thread is parked waiting for work (worker pools
+# in Condition.wait / Queue.get, joins). Only these are skipped.
+PARKED = {('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'), ('queue.py', 'get')}
+# Leaf frames here mean the thread is blocked on network I/O. They stay in
+# the wall-clock report and are also summarised in their own section.
+IO_FILES = ('socket.py', 'ssl.py', 'selectors.py')
+
+_busy = threading.Lock()
+_repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _label(key):
+    filename, lineno, name = key
+    if filename.startswith(_repo_root):
+        filename = os.path.relpath(filename, _repo_root)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{lineno}({name})" if name else f"{filename}:{lineno}"
+
+
+def _io_caller(frame):
+    """Innermost frame from this repo waiting on the I/O, else the innermost non-socket frame."""
+    fallback = None
+    depth = 0
+    while frame is not None and depth < MAX_DEPTH:
+        code = frame.f_code
+        if code.co_filename.startswith(_repo_root):
+            return (code.co_filename, code.co_firstlineno, code.co_name)
+        if fallback is None and os.path.basename(code.co_filename) not in IO_FILES:
+            fallback = (code.co_filename, code.co_firstlineno, code.co_name)
+        frame = frame.f_back
+        depth += 1
+    return fallback or ('?', 0, '')
+
+
+def _sample(seconds, interval, exclude=()):
+    """Wall-clock sampling of every other thread's Python stack, minus threads named in ``exclude``."""
+    own = threading.get_ident()
+    skip = {t.ident for t in threading.enumerate() if t.name in exclude}
+    skip.add(own)
+    inclusive, exclusive, io_waits = Counter(), Counter(), Counter()
+    ticks = busy = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        ticks += 1
+        names = None
+        for tid, frame in sys._current_frames().items():
+            leaf_file = os.path.basename(frame.f_code.co_filename)
+            if tid in skip or (leaf_file, frame.f_code.co_name) in PARKED:
+                continue
+            busy += 1
+            if leaf_file in IO_FILES:
+                if names is None:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                io_waits[(names.get(tid, tid), _io_caller(frame))] += 1
+            seen = set()
+            leaf = True
+            depth = 0
+            while frame is not None and depth < MAX_DEPTH:
+                code = frame.f_code
+                key = (code.co_filename, code.co_firstlineno, code.co_name)
+                if leaf:
+                    exclusive[key] += 1
+                    leaf = False
+                if key not in seen:
+                    inclusive[key] += 1
+                    seen.add(key)
+                frame = frame.f_back
+                depth += 1
+        time.sleep(interval)
+    return ticks, busy, inclusive, exclusive, io_waits
+
+
+def profile(seconds, top=15, interval=SAMPLE_INTERVAL, exclude=()):
+    """
+    Sample all threads and trace allocations for ``seconds``.
+
+    Only one profile runs at a time; the sampler lives in the calling
+    thread, so run this off the dispatcher. ``exclude`` names threads known
+    to idle in ways the sampler cannot tell from work (``time.sleep`` loops,
+    long-polls), so they do not crowd handler frames out of the report.
+
+    Returns:
+        tuple: (success: bool, report: str, error_message: str)
+    """
+    seconds = max(1, min(int(seconds), MAX_SECONDS))
+    if not _busy.acquire(blocking=False):
+        return False, None, "A profile is already running"
+    started_tracing = False
+    try:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(1)
+            started_tracing = True
+        before = tracemalloc.take_snapshot()
+        t0 = time.monotonic()
+        ticks, busy, inclusive, exclusive, io_waits = _sample(seconds, interval, exclude)
+        per_tick = (time.monotonic() - t0) / max(ticks, 1)
+        after = tracemalloc.take_snapshot()
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+        growth = [s for s in diff if s.size_diff > 0][:top]
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+        _busy.release()
+
+    lines = [f"⏱ Profile: {seconds}s, {ticks} ticks, {busy} busy thread-samples"]
+    if exclude:
+        lines.append("Idle threads skipped: " + ", ".join(sorted(exclude)))
+    lines.append("\nTop functions by cumulative samples:")
+    for key, count in inclusive.most_common(top):
+        lines.append(f"{count * per_tick:6.2f}s cum {exclusive[key] * per_tick:6.2f}s self  {_label(key)}")
+    if not inclusive:
+        lines.append("(no busy threads observed)")
+    lines.append("\nBlocked on network I/O (thread, waiting code):")
+    for (thread_name, key), count in io_waits.most_common(top):
+        lines.append(f"{count * per_tick:6.2f}s  {thread_name}  {_label(key)}")
+    if not io_waits:
+        lines.append("(none)")
+    lines.append("\nTop allocation growth:")
+    for stat in growth:
+        frame = stat.traceback[0]
+        lines.append(f"{stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+6d} blocks  {_label((frame.filename, frame.lineno, ''))}")
+    if not growth:
+        lines.append("(no growth)")
+    return True, "\n".join(lines), None
@@ -0,0 +1,162 @@
+import os
+import math
+import mmap
+import time
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+
+DEDUPE_SCAN = 512   # rows to look back when checking for an already-stored table
+
+# Fixed column order. Codes outside this index are not stored; appending a
+# code here later just starts a new column (older rows read back as NaN).
+CURRENCIES = (
+    'USD', 'AED', 'AFN', 'ALL', 'AMD', 'ANG', 'AOA', 'ARS', 'AUD', 'AWG', 'AZN', 'BAM', 'BBD', 'BDT',
+    'BGN', 'BHD', 'BIF', 'BMD', 'BND', 'BOB', 'BRL', 'BSD', 'BTN', 'BWP', 'BYN', 'BZD', 'CAD', 'CDF',
+    'CHF', 'CLP', 'CNY', 'COP', 'CRC', 'CUP', 'CVE', 'CZK', 'DJF', 'DKK', 'DOP', 'DZD', 'EGP', 'ERN',
+    'ETB', 'EUR', 'FJD', 'FKP', 'FOK', 'GBP', 'GEL', 'GGP', 'GHS', 'GIP', 'GMD', 'GNF', 'GTQ', 'GYD',
+    'HKD', 'HNL', 'HRK', 'HTG', 'HUF', 'IDR', 'ILS', 'IMP', 'INR', 'IQD', 'IRR', 'ISK', 'JEP', 'JMD',
+    'JOD', 'JPY', 'KES', 'KGS', 'KHR', 'KID', 'KMF', 'KRW', 'KWD', 'KYD', 'KZT', 'LAK', 'LBP', 'LKR',
+    'LRD', 'LSL', 'LYD', 'MAD', 'MDL', 'MGA', 'MKD', 'MMK', 'MNT', 'MOP', 'MRU', 'MUR', 'MVR', 'MWK',
+    'MXN', 'MYR', 'MZN', 'NAD', 'NGN', 'NIO', 'NOK', 'NPR', 'NZD', 'OMR', 'PAB', 'PEN', 'PGK', 'PHP',
+    'PKR', 'PLN', 'PYG', 'QAR', 'RON', 'RSD', 'RUB', 'RWF', 'SAR', 'SBD', 'SCR', 'SDG', 'SEK', 'SGD',
+    'SHP', 'SLE', 'SLL', 'SOS', 'SRD', 'SSP', 'STN', 'SYP', 'SZL', 'THB', 'TJS', 'TMT', 'TND', 'TOP',
+    'TRY', 'TTD', 'TVD', 'TWD', 'TZS', 'UAH', 'UGX', 'UYU', 'UZS', 'VES', 'VND', 'VUV', 'WST', 'XAF',
+    'XCD', 'XDR', 'XOF', 'XPF', 'YER', 'ZAR', 'ZMW', 'ZWL',
+)
+INDEX = {code: i for i, code in enumerate(CURRENCIES)}
+
+
+class RateStore:
+    """
+    Append-only columnar store of exchange-rate tables.
+
+    One file per column under ``path``:
+      ts.f64       - local time each table was stored (non-decreasing)
+      updated.f64  - upstream "last updated" time of the table
+      base.u16     - index of the table's base currency in CURRENCIES
+      <CODE>.f64   - rate of CODE against that row's base (NaN if absent)
+
+    ts is written last, so its length is the committed row count. Because
+    every row is relative to its own base, any pair converts as
+    ``col[TO] / col[FROM]`` regardless of which base was fetched.
+    """
+
+    def __init__(self, path='rates_store'):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._repair()
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _repair(self):
+        # Drop the tail of a row a crash left half-written.
+        rows = os.path.getsize(self._file('ts.f64')) // 8 if os.path.exists(self._file('ts.f64')) else 0
+        for name, width in [('updated.f64', 8), ('base.u16', 2)] + [(f'{c}.f64', 8) for c in CURRENCIES]:
+            path = self._file(name)
+            if not os.path.exists(path):
+                # A column added after rows exist is back-filled with NaN.
+                with open(path, 'wb') as f:
+                    if rows:
+                        (array('H', [0] * rows) if width == 2 else array('d', [math.nan] * rows)).tofile(f)
+            elif os.path.getsize(path) > rows * width:
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * width)
+
+    @contextmanager
+    def _columns(self, *names):
+        """Memory-map the given columns read-only; yields (rows, views)."""
+        maps, views = [], []
+        try:
+            for name in ('ts.f64',) + names:
+                typecode = 'H' if name.endswith('.u16') else 'd'
+                path = self._file(name)
+                if not os.path.exists(path) or os.path.getsize(path) == 0:
+                    views.append(memoryview(b'').cast(typecode))
+                    continue
+                with open(path, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                maps.append(mm)
+                views.append(memoryview(mm).cast(typecode))
+            yield len(views[0]), views
+        finally:
+            for view in views:
+                view.release()
+            for mm in maps:
+                mm.close()
+
+    def append(self, base, rates, updated=None):
+        """
+        Store one rate table unless the same upstream table is already stored.
+
+        Returns:
+            bool: True if a row was appended
+        """
+        if base not in INDEX:
+            return False
+        updated = float(updated or time.time())
+        with self._lock:
+            with self._columns('base.u16', 'updated.f64') as (rows, (ts, bases, upd)):
+                for i in range(rows - 1, max(rows - DEDUPE_SCAN, 0) - 1, -1):
+                    if bases[i] == INDEX[base] and upd[i] == updated:
+                        return False
+                now = max(time.time(), ts[rows - 1] if rows else 0.0)
+            for code in CURRENCIES:
+                value = rates.get(code)
+                with open(self._file(f'{code}.f64'), 'ab') as f:
+                    array('d', [float(value) if value else math.nan]).tofile(f)
+            with open(self._file('base.u16'), 'ab') as f:
+                array('H', [INDEX[base]]).tofile(f)
+            with open(self._file('updated.f64'), 'ab') as f:
+                array('d', [updated]).tofile(f)
+            with open(self._file('ts.f64'), 'ab') as f:
+                array('d', [now]).tofile(f)
+        return True
+
+    def latest(self, from_cur, to_cur, before=None):
+        """
+        Most recent stored rate for the pair, optionally at or before ``before``.
+
+        Returns:
+            tuple: (rate: float, updated: float) or None
+        """
+        if from_cur not in INDEX or to_cur not in INDEX:
+            return None
+        with self._columns('updated.f64', f'{from_cur}.f64', f'{to_cur}.f64') as (rows, (ts, upd, src, dst)):
+            hi = bisect_right(ts, before) if before is not None else rows
+            for i in range(min(hi, len(src), len(dst)) - 1, -1, -1):
+                if not (math.isnan(src[i]) or math.isnan(dst[i])):
+                    return dst[i] / src[i], upd[i]
+        return None
+
+    def history(self, from_cur, to_cur, since):
+        """
+        Last stored rate per UTC day for the pair, from ``since`` onwards.
+
+        Returns:
+            list: (day: str, rate: float) tuples in date order
+        """
+        if from_cur not in INDEX or to_cur not in INDEX:
+            return []
+        days = {}
+        with self._columns(f'{from_cur}.f64', f'{to_cur}.f64') as (rows, (ts, src, dst)):
+            for i in range(bisect_left(ts, since), min(rows, len(src), len(dst))):
+                if not (math.isnan(src[i]) or math.isnan(dst[i])):
+                    days[time.strftime('%Y-%m-%d', time.gmtime(ts[i]))] = dst[i] / src[i]
+        return sorted(days.items())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store(path=None):
+    """Shared store; ``path`` (services['rates_dir']) applies on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RateStore(path or 'rates_store')
+        return _store
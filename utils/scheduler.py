@@ -1,3 +1,325 @@
+import os
+import time
+import uuid
+import pickle
+import logging
+import threading
+import concurrent.futures
+from pytz import utc
+from contextlib import contextmanager
+from apscheduler.schedulers.base import STATE_RUNNING, STATE_STOPPED
 from apscheduler.schedulers.background import BackgroundScheduler
-scheduler = BackgroundScheduler()
-scheduler.start()
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.executors.base import run_job, MaxInstancesReachedError
+from apscheduler.executors.pool import BasePoolExecutor, ThreadPoolExecutor
+from apscheduler.events import EVENT_JOB_MISSED
+from apscheduler.util import obj_to_ref
+from sqlalchemy import create_engine, event, and_, select, func as sql_func
+from utils.log_pipeline import worker_logging
+
+# Jobs whose callable and arguments can be pickled go to the SQLite store
+# and survive restarts. Closures defined inside a module's register() cannot,
+# so they live in the in-memory store and are re-added on every register().
+PERSISTENT = 'default'
+VOLATILE = 'volatile'
+
+# Created unconfigured so modules can add jobs while loading; jarvis_service
+# calls configure_scheduler() before loading modules and start() once they are all
+# imported, so stored job references (e.g. "reminder:send_reminder") resolve.
+# APScheduler 3.6 only accepts pytz zones; tzlocal>=3 returns zoneinfo ones,
+# so the zone is always given explicitly (as PTB's JobQueue does).
+scheduler = BackgroundScheduler(timezone=utc)
+
+
+def _sqlite_engine(path):
+    engine = create_engine(f'sqlite:///{path}')
+
+    @event.listens_for(engine, 'connect')
+    def _pragmas(conn, record):
+        cur = conn.cursor()
+        cur.execute('PRAGMA journal_mode=WAL')
+        cur.execute('PRAGMA synchronous=NORMAL')
+        cur.close()
+
+    return engine
+
+
+# ---------------------------------------------------------------------------
+# Per-job run-time metrics
+# ---------------------------------------------------------------------------
+# Aggregated per "<module>:<function>" rather than per job id, so tens of
+# thousands of one-off jobs (e.g. one per reminder) share a handful of rows.
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _metric_key(job):
+    namespace = job.id.split(':', 1)[0] if ':' in job.id else '-'
+    return f'{namespace}:{job.name}'
+
+
+def _record(job, **counts):
+    with _metrics_lock:
+        m = _metrics.get(_metric_key(job))
+        if m is None:
+            m = _metrics[_metric_key(job)] = {'runs': 0, 'errors': 0, 'missed': 0, 'skipped': 0,
+                                              'run_total': 0.0, 'run_max': 0.0, 'run_last': 0.0,
+                                              'lag_total': 0.0, 'lag_max': 0.0}
+        for name in ('runs', 'errors', 'missed', 'skipped'):
+            m[name] += counts.get(name, 0)
+        if 'duration' in counts:
+            m['run_total'] += counts['duration']
+            m['run_last'] = counts['duration']
+            m['run_max'] = max(m['run_max'], counts['duration'])
+        if 'lag' in counts:
+            m['lag_total'] += counts['lag']
+            m['lag_max'] = max(m['lag_max'], counts['lag'])
+
+
+def _timed_run_job(job, jobstore_alias, run_times, logger_name):
+    # Module-level so the process pool can pickle it.
+    started_at = time.time()
+    started = time.perf_counter()
+    events = run_job(job, jobstore_alias, run_times, logger_name)
+    return events, time.perf_counter() - started, started_at
+
+
+class _TimedPoolMixin:
+    """
+    Times the job body inside the worker, apart from the lag between the
+    scheduled fire time and the moment a worker picked the job up.
+    """
+
+    def submit_job(self, job, run_times):
+        try:
+            super().submit_job(job, run_times)
+        except MaxInstancesReachedError:
+            _record(job, skipped=1)
+            raise
+
+    def _do_submit_job(self, job, run_times):
+        def callback(f):
+            exc, tb = (f.exception_info() if hasattr(f, 'exception_info') else
+                       (f.exception(), getattr(f.exception(), '__traceback__', None)))
+            if exc:
+                _record(job, errors=1)
+                self._run_job_error(job.id, exc, tb)
+                return
+            events, duration, started_at = f.result()
+            missed = sum(1 for ev in events if ev.code == EVENT_JOB_MISSED)
+            ran = len(events) - missed
+            errors = sum(1 for ev in events if getattr(ev, 'exception', None) is not None)
+            counts = {'runs': ran, 'errors': errors, 'missed': missed}
+            if ran:
+                counts['duration'] = duration
+                counts['lag'] = max(0.0, started_at - run_times[-1].timestamp())
+            _record(job, **counts)
+            self._run_job_success(job.id, events)
+
+        f = self._pool.submit(_timed_run_job, job, job._jobstore_alias, run_times, self._logger.name)
+        f.add_done_callback(callback)
+
+
+class TimedThreadPoolExecutor(_TimedPoolMixin, ThreadPoolExecutor):
+    pass
+
+
+class TimedProcessPoolExecutor(_TimedPoolMixin, BasePoolExecutor):
+    """Process pool whose workers log to stdout instead of the parent's in-process queue."""
+
+    def __init__(self, max_workers=10):
+        pool = concurrent.futures.ProcessPoolExecutor(int(max_workers), initializer=worker_logging,
+                                                      initargs=(logging.getLogger().level,))
+        super().__init__(pool)
+
+
+def job_metrics():
+    """
+    Snapshot of run-time metrics per "<module>:<function>".
+
+    Returns:
+        dict: key -> {runs, errors, missed, skipped, avg, max, last, lag_avg, lag_max} (seconds)
+    """
+    with _metrics_lock:
+        out = {}
+        for key, m in _metrics.items():
+            runs = m['runs'] or 1
+            out[key] = {'runs': m['runs'], 'errors': m['errors'], 'missed': m['missed'], 'skipped': m['skipped'],
+                        'avg': m['run_total'] / runs, 'max': m['run_max'], 'last': m['run_last'],
+                        'lag_avg': m['lag_total'] / runs, 'lag_max': m['lag_max']}
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Engine setup
+# ---------------------------------------------------------------------------
+def configure_scheduler(services):
+    """Install job stores, executors and job defaults; call before scheduler.start()."""
+    cpu_workers = services.get('scheduler_cpu_workers') or os.cpu_count() or 2
+    scheduler.configure(
+        jobstores={
+            PERSISTENT: SQLAlchemyJobStore(engine=_sqlite_engine(services.get('scheduler_db') or 'jarvis_jobs.db')),
+            VOLATILE: MemoryJobStore(),
+        },
+        executors={
+            'default': TimedThreadPoolExecutor(services.get('scheduler_io_workers') or 20),  # I/O-bound: HTTP, DB, Telegram
+            'cpu': TimedProcessPoolExecutor(cpu_workers),  # CPU-bound; callable must be picklable
+        },
+        job_defaults={
+            'coalesce': True,              # collapse a backlog of missed runs into one
+            'max_instances': 1,
+            'misfire_grace_time': services.get('scheduler_misfire_grace') or 300,
+        },
+        timezone=utc,
+    )
+
+
+def job_count():
+    """Number of scheduled jobs, counted without unpickling them."""
+    if scheduler.state == STATE_STOPPED:
+        return len(scheduler.get_jobs())
+    total = 0
+    with scheduler._jobstores_lock:
+        for store in scheduler._jobstores.values():
+            if isinstance(store, SQLAlchemyJobStore):
+                total += store.engine.execute(select([sql_func.count()]).select_from(store.jobs_t)).scalar()
+            else:
+                total += len(store._jobs)
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Per-module namespaces
+# ---------------------------------------------------------------------------
+def _persistable(func, args, kwargs):
+    if isinstance(func, str):
+        return True
+    try:
+        obj_to_ref(func)
+        pickle.dumps((args, kwargs))
+        return True
+    except Exception:
+        return False
+
+
+def _id_range(store, namespace):
+    # Ids "<ns>:..." sort between "<ns>:" and "<ns>;", so the primary key
+    # index answers the query without unpickling other modules' jobs.
+    col = store.jobs_t.c.id
+    return and_(col >= f'{namespace}:', col < f'{namespace};')
+
+
+def _namespace_jobs(namespace, jobstore=None):
+    prefix = f'{namespace}:'
+    if scheduler.state == STATE_STOPPED:
+        return [job for job in scheduler.get_jobs(jobstore) if job.id.startswith(prefix)]
+    jobs = []
+    with scheduler._jobstores_lock:
+        for alias, store in scheduler._jobstores.items():
+            if jobstore is not None and alias != jobstore:
+                continue
+            if isinstance(store, SQLAlchemyJobStore):
+                found = store._get_jobs(_id_range(store, namespace))
+            else:
+                found = [job for job in store.get_all_jobs() if job.id.startswith(prefix)]
+            jobs.extend(found)
+    return jobs
+
+
+def remove_namespace(namespace, jobstore=None):
+    """Remove every job whose id starts with ``<namespace>:``; returns the count."""
+    if scheduler.state == STATE_STOPPED:
+        jobs = _namespace_jobs(namespace, jobstore)
+        for job in jobs:
+            scheduler.remove_job(job.id)
+        return len(jobs)
+    removed = 0
+    with scheduler._jobstores_lock:
+        for alias, store in scheduler._jobstores.items():
+            if jobstore is not None and alias != jobstore:
+                continue
+            if isinstance(store, SQLAlchemyJobStore):
+                result = store.engine.execute(store.jobs_t.delete().where(_id_range(store, namespace)))
+                removed += result.rowcount
+            else:
+                for job in [j for j in store.get_all_jobs() if j.id.startswith(f'{namespace}:')]:
+                    store.remove_job(job.id)
+                    removed += 1
+    return removed
+
+
+class ModuleScheduler:
+    """
+    The scheduler as seen by one module: job ids are prefixed with
+    ``<module>:`` and anything else is delegated to the real scheduler.
+
+    ``add_job(durable=...)`` picks the store: True requires a module-level
+    function and picklable arguments and keeps the job across restarts,
+    False keeps it in memory, None (default) persists whatever can be.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+
+    def _id(self, job_id):
+        return f'{self.namespace}:{job_id}'
+
+    def add_job(self, func, trigger=None, args=None, kwargs=None, id=None, jobstore=None, durable=None, **options):
+        if jobstore is None:
+            persistable = _persistable(func, args, kwargs)
+            if durable and not persistable:
+                raise ValueError(f'{func!r} cannot be stored durably: use a module-level function and picklable args')
+            jobstore = PERSISTENT if persistable and durable is not False else VOLATILE
+        job_id = self._id(id or uuid.uuid4().hex)
+        return scheduler.add_job(func, trigger, args, kwargs, id=job_id, jobstore=jobstore, **options)
+
+    def get_job(self, job_id, jobstore=None):
+        return scheduler.get_job(self._id(job_id), jobstore)
+
+    def get_jobs(self, jobstore=None):
+        return _namespace_jobs(self.namespace, jobstore)
+
+    def remove_job(self, job_id, jobstore=None):
+        scheduler.remove_job(self._id(job_id), jobstore)
+
+    def remove_all_jobs(self, jobstore=None):
+        return remove_namespace(self.namespace, jobstore)
+
+    def modify_job(self, job_id, jobstore=None, **changes):
+        return scheduler.modify_job(self._id(job_id), jobstore, **changes)
+
+    def reschedule_job(self, job_id, jobstore=None, trigger=None, **trigger_args):
+        return scheduler.reschedule_job(self._id(job_id), jobstore, trigger, **trigger_args)
+
+    def pause_job(self, job_id, jobstore=None):
+        return scheduler.pause_job(self._id(job_id), jobstore)
+
+    def resume_job(self, job_id, jobstore=None):
+        return scheduler.resume_job(self._id(job_id), jobstore)
+
+    @contextmanager
+    def bulk(self):
+        """
+        Pause job processing while adding many jobs at once.
+
+        Every add_job on a running scheduler wakes the scheduler thread,
+        which then contends for the job store lock; pausing roughly halves
+        the cost of adding thousands of jobs. Due jobs run after resume,
+        within the misfire grace time.
+        """
+        paused = scheduler.state == STATE_RUNNING
+        if paused:
+            scheduler.pause()
+        try:
+            yield self
+        finally:
+            if paused:
+                scheduler.resume()
+
+    def __getattr__(self, name):
+        return getattr(scheduler, name)
+
+
+def module_scheduler(namespace):
+    return ModuleScheduler(namespace)